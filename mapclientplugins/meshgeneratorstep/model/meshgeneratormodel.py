@@ -4,19 +4,21 @@ Mesh generator class. Generates Zinc meshes using scaffoldmaker.
 
 from __future__ import division
 import copy
+from functools import reduce
+from itertools import groupby
 import os
 import math
-import string
+import re
 
 from opencmiss.utils.zinc.field import findOrCreateFieldCoordinates, findOrCreateFieldStoredMeshLocation, findOrCreateFieldStoredString
 from opencmiss.utils.zinc.finiteelement import evaluateFieldNodesetRange
 from opencmiss.utils.zinc.general import ChangeManager
-from opencmiss.utils.maths.vectorops import axis_angle_to_rotation_matrix, euler_to_rotation_matrix, matrix_mult, rotation_matrix_to_euler
+from opencmiss.utils.maths.vectorops import matrix_mult
 from opencmiss.zinc.field import Field, FieldGroup
 from opencmiss.zinc.glyph import Glyph
 from opencmiss.zinc.graphics import Graphics
 from opencmiss.zinc.node import Node
-from opencmiss.zinc.result import RESULT_OK, RESULT_WARNING_PART_DONE
+from opencmiss.zinc.result import RESULT_OK
 from opencmiss.zinc.scenecoordinatesystem import SCENECOORDINATESYSTEM_WORLD
 from scaffoldmaker.scaffolds import Scaffolds
 from scaffoldmaker.scaffoldpackage import ScaffoldPackage
@@ -24,6 +26,9 @@ from scaffoldmaker.utils.exportvtk import ExportVtk
 from scaffoldmaker.utils.zinc_utils import *
 
 STRING_FLOAT_FORMAT = '{:.8g}'
+# element identifier or identifier range e.g. 7 or 3-5; ignores trailing characters after each identifier
+# e.g. from select 's' key, and any parts after a second '-'
+_DELETE_RANGE_RE = re.compile(r'\s*\+?([0-9]+)[^0-9-]*(?:-\s*\+?([0-9]+)[^0-9-]*(?:-.*)?)?', re.DOTALL)
 
 
 def parseVector3(vectorText : str, delimiter, defaultValue):
@@ -35,20 +40,171 @@ def parseVector3(vectorText : str, delimiter, defaultValue):
     :param defaultValue: Value to use for invalid components.
     :return: list of 3 component values parsed from vectorText.
     """
-    vector = []
-    for valueText in vectorText.split(delimiter):
-        try:
-            vector.append(float(valueText))
-        except:
-            vector.append(defaultValue)
+    valueTexts = vectorText.split(delimiter)
+    try:
+        vector = list(map(float, valueTexts))
+    except ValueError:
+        # slow path: substitute defaultValue for each invalid component
+        vector = []
+        for valueText in valueTexts:
+            try:
+                vector.append(float(valueText))
+            except ValueError:
+                vector.append(defaultValue)
     if len(vector) > 3:
-        vector = vector[:3]
-    else:
-        for i in range(3 - len(vector)):
-            vector.append(vector[-1])
+        return vector[:3]
+    vector += [ vector[-1] ] * (3 - len(vector))
     return vector
 
 
+def parseIdentifierRanges(rangesText):
+    """
+    Parse comma separated identifiers and identifier ranges into sorted, disjoint ranges.
+    Reversed ranges e.g. 5-3 are accepted, overlapping and adjacent ranges are merged,
+    and invalid entries are ignored.
+    :param rangesText: Text e.g. '1-3,7,10-8'.
+    :return: List of (start, stop) tuples in increasing order e.g. [ (1, 3), (7, 10) ].
+    """
+    parsedRanges = []
+    for rangeText in rangesText.split(','):
+        match = _DELETE_RANGE_RE.fullmatch(rangeText)
+        if match:
+            start = int(match.group(1))
+            stop = int(match.group(2) or match.group(1))
+            parsedRanges.append((start, stop) if (stop >= start) else (stop, start))
+    parsedRanges.sort()
+    # merge adjacent or overlapping ranges to give minimal sorted, disjoint ranges:
+    identifierRanges = []
+    for start, stop in parsedRanges:
+        if identifierRanges and (start <= (identifierRanges[-1][1] + 1)):
+            if stop > identifierRanges[-1][1]:
+                identifierRanges[-1] = (identifierRanges[-1][0], stop)
+        else:
+            identifierRanges.append((start, stop))
+    return identifierRanges
+
+
+def identifiersToRanges(identifiers):
+    """
+    :param identifiers: Unique identifiers in increasing order.
+    :return: List of (start, stop) tuples for each run of consecutive identifiers.
+    """
+    # consecutive identifiers have the same difference from their index
+    identifierRanges = []
+    for _, run in groupby(enumerate(identifiers), key=lambda indexIdentifier: indexIdentifier[1] - indexIdentifier[0]):
+        run = list(run)
+        identifierRanges.append((run[0][1], run[-1][1]))
+    return identifierRanges
+
+
+def identifierRangesToText(identifierRanges):
+    """
+    :param identifierRanges: List of (start, stop) identifier ranges.
+    :return: Comma separated ranges text e.g. '1-3,7,10-12'.
+    """
+    return ','.join((str(start) if (stop == start) else (str(start) + '-' + str(stop))) for start, stop in identifierRanges)
+
+
+def getAxesScale(maxRange):
+    """
+    Get the power of 10 nearest to 1.0 with maxRange within a factor of 10 of it:
+    the largest power of 10 below maxRange if over 10, the smallest power of 10 not
+    less than maxRange if under 0.1, otherwise 1.0.
+    :param maxRange: Largest range of coordinates.
+    :return: Axes scale. 1.0 if maxRange is not positive.
+    """
+    if maxRange > 10.0:
+        exponent = math.ceil(math.log10(maxRange)) - 1
+        # correct for rounding in log10 near powers of 10
+        if 10.0**(exponent + 1) < maxRange:
+            exponent += 1
+        elif 10.0**exponent >= maxRange:
+            exponent -= 1
+    elif 0.0 < maxRange < 0.1:
+        exponent = math.ceil(math.log10(maxRange))
+        if 10.0**exponent < maxRange:
+            exponent += 1
+        elif 10.0**(exponent - 1) >= maxRange:
+            exponent -= 1
+    else:
+        return 1.0
+    return 10.0**exponent
+
+
+def zincIterate(iterator):
+    """
+    Generator over objects returned by a Zinc iterator until an invalid object is returned.
+    :param iterator: Zinc iterator e.g. Elementiterator, Nodeiterator.
+    """
+    obj = iterator.next()
+    while obj.isValid():
+        yield obj
+        obj = iterator.next()
+
+
+def axisAngleToQuaternion(axis, angle):
+    """
+    :param axis: 3 component rotation axis, need not be unit length.
+    :param angle: Angle of rotation about axis in radians.
+    :return: Unit quaternion [ w, x, y, z ].
+    """
+    magnitude = math.sqrt(axis[0]*axis[0] + axis[1]*axis[1] + axis[2]*axis[2])
+    halfAngle = 0.5*angle
+    s = math.sin(halfAngle)/magnitude
+    return [ math.cos(halfAngle), s*axis[0], s*axis[1], s*axis[2] ]
+
+
+def eulerToQuaternion(euler):
+    """
+    :param euler: Euler angles [ azimuth, elevation, roll ] in radians, as for
+    euler_to_rotation_matrix: rotation about z, then rotated y, then rotated x.
+    :return: Unit quaternion [ w, x, y, z ].
+    """
+    cos, sin = math.cos, math.sin
+    ca, sa = cos(0.5*euler[0]), sin(0.5*euler[0])
+    ce, se = cos(0.5*euler[1]), sin(0.5*euler[1])
+    cr, sr = cos(0.5*euler[2]), sin(0.5*euler[2])
+    return [
+        ca*ce*cr + sa*se*sr,
+        ca*ce*sr - sa*se*cr,
+        ca*se*cr + sa*ce*sr,
+        sa*ce*cr - ca*se*sr ]
+
+
+def quaternionMultiply(q1, q2):
+    """
+    :return: Quaternion product q1*q2, i.e. rotation q2 followed by rotation q1.
+    """
+    w1, x1, y1, z1 = q1
+    w2, x2, y2, z2 = q2
+    return [
+        w1*w2 - x1*x2 - y1*y2 - z1*z2,
+        w1*x2 + x1*w2 + y1*z2 - z1*y2,
+        w1*y2 - x1*z2 + y1*w2 + z1*x2,
+        w1*z2 + x1*y2 - y1*x2 + z1*w2 ]
+
+
+def quaternionToEuler(q):
+    """
+    :param q: Unit quaternion [ w, x, y, z ].
+    :return: Euler angles [ azimuth, elevation, roll ] in radians, as for rotation_matrix_to_euler.
+    """
+    w, x, y, z = q
+    # rotation matrix entries needed for decomposition
+    m00 = 1.0 - 2.0*(y*y + z*z)
+    m10 = 2.0*(x*y + w*z)
+    m20 = 2.0*(x*z - w*y)
+    m21 = 2.0*(y*z + w*x)
+    m22 = 1.0 - 2.0*(x*x + y*y)
+    elevation = math.asin(max(-1.0, min(1.0, -m20)))
+    if (math.fabs(m00) > 1.0E-6) or (math.fabs(m10) > 1.0E-6):
+        return [ math.atan2(m10, m00), elevation, math.atan2(m21, m22) ]
+    # gimbal lock: put all rotation about z into azimuth
+    m01 = 2.0*(x*y - w*z)
+    m11 = 1.0 - 2.0*(x*x + z*z)
+    return [ math.atan2(-m01, m11), elevation, 0.0 ]
+
+
 class MeshGeneratorModel(object):
     """
     Framework for generating meshes of a number of types, with mesh type specific options
@@ -59,7 +215,19 @@ class MeshGeneratorModel(object):
         self._region_name = "generated_mesh"
         self._parent_region = region
         self._materialmodule = material_module
+        # all materials used by graphics, found once
+        self._materials = { name : self._materialmodule.findMaterialByName(name) for name in
+            ( 'blue', 'cyan', 'default', 'gold', 'green', 'grey50', 'magenta', 'silver', 'solid_blue', 'trans_blue', 'white', 'yellow' ) }
         self._region = None
+        self._graphics = {}  # map from name to singly named graphics in scene, rebuilt by _createGraphics
+        # fieldmodule, coordinates, nodes and fieldcache for the current region, reset by _generateMesh
+        self._fieldmodule = None
+        self._coordinates = None
+        self._nodes = None
+        self._fieldcache = None
+        self._mesh = None  # cached by _getMesh
+        self._mesh2dSize = 0  # number of 2D elements (faces) in generated mesh, set by _generateMesh
+        self._glyphWidth = 1.0  # set by _calculateMeshGraphicsData for resizing model radius graphics
         self._fieldmodulenotifier = None
         self._annotationGroups = None
         self._customParametersCallback = None
@@ -71,6 +239,7 @@ class MeshGeneratorModel(object):
         # discover all mesh types and set the current from the default
         scaffolds = Scaffolds()
         self._allScaffoldTypes = scaffolds.getScaffoldTypes()
+        self._scaffoldTypesByName = { scaffoldType.getName() : scaffoldType for scaffoldType in self._allScaffoldTypes }
         scaffoldType = scaffolds.getDefaultScaffoldType()
         scaffoldPackage = ScaffoldPackage(scaffoldType)
         self._parameterSetName = scaffoldType.getParameterSetNames()[0]
@@ -95,6 +264,8 @@ class MeshGeneratorModel(object):
             'displayAxes' : True,
             'displayMarkerPoints' : False
         }
+        # set of displayNodeDerivativeLabels for membership tests; list in settings is authoritative
+        self._displayNodeDerivativeLabelsSet = frozenset(self._settings['displayNodeDerivativeLabels'])
         self._customScaffoldPackage = None  # temporary storage of custom mesh options and edits, to switch back to
         self._unsavedNodeEdits = False  # Whether nodes have been edited since ScaffoldPackage meshEdits last updated
 
@@ -122,14 +293,13 @@ class MeshGeneratorModel(object):
                 self._customParametersCallback()
 
     def getMeshEditsGroup(self):
-        fm = self._region.getFieldmodule()
-        return fm.findFieldByName('meshEdits').castGroup()
+        return self._fieldmodule.findFieldByName('meshEdits').castGroup()
 
     def getOrCreateMeshEditsNodesetGroup(self, nodeset):
         '''
         Someone is about to edit a node, and must add the modified node to this nodesetGroup.
         '''
-        fm = self._region.getFieldmodule()
+        fm = self._fieldmodule
         with ChangeManager(fm):
             group = fm.findFieldByName('meshEdits').castGroup()
             if not group.isValid():
@@ -145,10 +315,10 @@ class MeshGeneratorModel(object):
         return nodesetGroup
 
     def interactionRotate(self, axis, angle):
-        mat1 = axis_angle_to_rotation_matrix(axis, angle)
-        mat2 = euler_to_rotation_matrix([ deg*math.pi/180.0 for deg in self._scaffoldPackages[-1].getRotation() ])
-        newmat = matrix_mult(mat1, mat2)
-        rotation = [ rad*180.0/math.pi for rad in rotation_matrix_to_euler(newmat) ]
+        quat1 = axisAngleToQuaternion(axis, angle)
+        quat2 = eulerToQuaternion(list(map(math.radians, self._scaffoldPackages[-1].getRotation())))
+        newquat = quaternionMultiply(quat1, quat2)
+        rotation = list(map(math.degrees, quaternionToEuler(newquat)))
         if self._scaffoldPackages[-1].setRotation(rotation):
             self._setGraphicsTransformation()
             if self._transformationChangeCallback:
@@ -183,10 +353,7 @@ class MeshGeneratorModel(object):
         self._parameterSetName = self.getEditScaffoldParameterSetNames()[0]
 
     def _getScaffoldTypeByName(self, name):
-        for scaffoldType in self._allScaffoldTypes:
-            if scaffoldType.getName() == name:
-                return scaffoldType
-        return None
+        return self._scaffoldTypesByName.get(name)
 
     def setScaffoldTypeByName(self, name):
         scaffoldType = self._getScaffoldTypeByName(name)
@@ -199,13 +366,11 @@ class MeshGeneratorModel(object):
                 self._generateMesh()
 
     def getAvailableScaffoldTypeNames(self):
-        scaffoldTypeNames = []
         parentScaffoldType = self.getParentScaffoldType()
-        validScaffoldTypes = parentScaffoldType.getOptionValidScaffoldTypes(self._scaffoldPackageOptionNames[-1]) if parentScaffoldType else None
-        for scaffoldType in self._allScaffoldTypes:
-            if (not parentScaffoldType) or (scaffoldType in validScaffoldTypes):
-                scaffoldTypeNames.append(scaffoldType.getName())
-        return scaffoldTypeNames
+        if not parentScaffoldType:
+            return [ scaffoldType.getName() for scaffoldType in self._allScaffoldTypes ]
+        validScaffoldTypes = frozenset(parentScaffoldType.getOptionValidScaffoldTypes(self._scaffoldPackageOptionNames[-1]))
+        return [ scaffoldType.getName() for scaffoldType in self._allScaffoldTypes if scaffoldType in validScaffoldTypes ]
 
     def getEditScaffoldTypeName(self):
         return self.getEditScaffoldType().getName()
@@ -348,6 +513,8 @@ class MeshGeneratorModel(object):
         settings = self.getEditScaffoldSettings()
         oldValue = settings[key]
         # print('setScaffoldOption: key ', key, ' value ', str(value))
+        if (type(value) is type(oldValue)) and (value == oldValue):
+            return False
         newValue = None
         try:
             if type(oldValue) is bool:
@@ -363,6 +530,9 @@ class MeshGeneratorModel(object):
         except:
             print('setScaffoldOption: Invalid value')
             return
+        if (type(oldValue) is float) and math.isclose(newValue, oldValue, rel_tol=1.0E-12, abs_tol=0.0):
+            # e.g. same text re-entered: no change
+            return False
         settings[key] = newValue
         dependentChanges = scaffoldType.checkOptions(settings)
         # print('final value = ', settings[key])
@@ -379,52 +549,10 @@ class MeshGeneratorModel(object):
         """
         :return: True if ranges changed, otherwise False
         """
-        elementRanges = []
-        for elementRangeText in elementRangesTextIn.split(','):
-            try:
-                elementRangeEnds = elementRangeText.split('-')
-                # remove trailing non-numeric characters, workaround for select 's' key ending up there
-                for e in range(len(elementRangeEnds)):
-                    size = len(elementRangeEnds[e])
-                    for i in range(size):
-                        if elementRangeEnds[e][size - i - 1] in string.digits:
-                            break;
-                    if i > 0:
-                        elementRangeEnds[e] = elementRangeEnds[e][:(size - i)]
-                elementRangeStart = int(elementRangeEnds[0])
-                if len(elementRangeEnds) > 1:
-                    elementRangeStop = int(elementRangeEnds[1])
-                else:
-                    elementRangeStop = elementRangeStart
-                if elementRangeStop >= elementRangeStart:
-                    elementRanges.append([elementRangeStart, elementRangeStop])
-                else:
-                    elementRanges.append([elementRangeStop, elementRangeStart])
-            except:
-                pass
-        elementRanges.sort()
-        # merge adjacent or overlapping ranges:
-        i = 1
-        while i < len(elementRanges):
-            if elementRanges[i][0] <= (elementRanges[i - 1][1] + 1):
-                if elementRanges[i][1] > elementRanges[i - 1][1]:
-                    elementRanges[i - 1][1] = elementRanges[i][1]
-                elementRanges.pop(i)
-            else:
-                i += 1
-        elementRangesText = ''
-        first = True
-        for elementRange in elementRanges:
-            if first:
-                first = False
-            else:
-                elementRangesText += ','
-            elementRangesText += str(elementRange[0])
-            if elementRange[1] != elementRange[0]:
-                elementRangesText += '-' + str(elementRange[1])
+        elementRanges = parseIdentifierRanges(elementRangesTextIn)
         changed = self._deleteElementRanges != elementRanges
         self._deleteElementRanges = elementRanges
-        self._settings['deleteElementRanges'] = elementRangesText
+        self._settings['deleteElementRanges'] = identifierRangesToText(elementRanges)
         return changed
 
     def setDeleteElementsRangesText(self, elementRangesTextIn):
@@ -435,7 +563,6 @@ class MeshGeneratorModel(object):
         '''
         Add the elements in the scene selection to the delete element ranges and delete.
         '''
-        fm = self._region.getFieldmodule()
         scene = self._region.getScene()
         mesh = self._getMesh()
         selectionGroup = scene.getSelectionField().castGroup()
@@ -443,22 +570,8 @@ class MeshGeneratorModel(object):
         if meshGroup.isValid() and (meshGroup.getSize() > 0):
             # convert selection to element ranges text
             # following assumes iteration is in identifier order!
-            elementIter = meshGroup.createElementiterator()
-            element = elementIter.next()
-            lastIdentifier = startIdentifier = element.getIdentifier()
-            elementRangesText = str(startIdentifier)
-            element = elementIter.next()
-            while element.isValid():
-                identifier = element.getIdentifier()
-                if identifier > (lastIdentifier + 1):
-                    if lastIdentifier > startIdentifier:
-                        elementRangesText += "-" + str(lastIdentifier)
-                    startIdentifier = identifier
-                    elementRangesText += "," + str(startIdentifier)
-                lastIdentifier = identifier
-                element = elementIter.next()
-            if lastIdentifier > startIdentifier:
-                elementRangesText += "-" + str(lastIdentifier)
+            identifiers = [ element.getIdentifier() for element in zincIterate(meshGroup.createElementiterator()) ]
+            elementRangesText = identifierRangesToText(identifiersToRanges(identifiers))
             # append to current delete element ranges
             self.setDeleteElementsRangesText(self._settings['deleteElementRanges'] + "," + elementRangesText)
 
@@ -500,8 +613,7 @@ class MeshGeneratorModel(object):
 
     def _setVisibility(self, graphicsName, show):
         self._settings[graphicsName] = show
-        graphics = self._region.getScene().findGraphicsByName(graphicsName)
-        graphics.setVisibilityFlag(show)
+        self._graphics[graphicsName].setVisibilityFlag(show)
 
     def isDisplayMarkerPoints(self):
         return self._getVisibility('displayMarkerPoints')
@@ -532,8 +644,7 @@ class MeshGeneratorModel(object):
 
     def setDisplayLinesExterior(self, isExterior):
         self._settings['displayLinesExterior'] = isExterior
-        lines = self._region.getScene().findGraphicsByName('displayLines')
-        lines.setExterior(self.isDisplayLinesExterior())
+        self._graphics['displayLines'].setExterior(self.isDisplayLinesExterior())
 
     def isDisplayModelRadius(self):
         return self._getVisibility('displayModelRadius')
@@ -541,7 +652,36 @@ class MeshGeneratorModel(object):
     def setDisplayModelRadius(self, show):
         if show != self._settings['displayModelRadius']:
             self._settings['displayModelRadius'] = show
-            self._createGraphics()
+            with ChangeManager(self._region.getScene()):
+                self._setModelRadiusGraphics(self._graphics['displayLines'], self._graphics['displayNodePoints'])
+
+    def _setModelRadiusGraphics(self, lines, nodePoints):
+        '''
+        Update existing lines and node points graphics to show model radius or not.
+        '''
+        radius = self._fieldmodule.findFieldByName('radius')
+        showRadius = self.isDisplayModelRadius() and radius.isValid()
+        lineattr = lines.getGraphicslineattributes()
+        pointattr = nodePoints.getGraphicspointattributes()
+        if showRadius:
+            lineattr.setShapeType(lineattr.SHAPE_TYPE_CIRCLE_EXTRUSION)
+            lineattr.setBaseSize([ 0.0 ])
+            lineattr.setScaleFactors([ 2.0 ])
+            lineattr.setOrientationScaleField(radius)
+            pointattr.setBaseSize([ 0.0 ])
+            pointattr.setScaleFactors([ 2.0 ])
+            pointattr.setOrientationScaleField(radius)
+        else:
+            # restore defaults
+            lineattr.setShapeType(lineattr.SHAPE_TYPE_LINE)
+            lineattr.setBaseSize([ 0.0 ])
+            lineattr.setScaleFactors([ 1.0 ])
+            lineattr.setOrientationScaleField(Field())
+            pointattr.setBaseSize([ self._glyphWidth ])
+            pointattr.setScaleFactors([ 1.0 ])
+            pointattr.setOrientationScaleField(Field())
+        isTranslucentLines = self.isDisplaySurfacesTranslucent() and showRadius
+        lines.setMaterial(self._materials['trans_blue' if isTranslucentLines else 'default'])
 
     def isDisplayNodeDerivatives(self):
         return self._getVisibility('displayNodeDerivatives')
@@ -561,20 +701,29 @@ class MeshGeneratorModel(object):
 
     def setDisplayNodeDerivatives(self, show):
         self._settings['displayNodeDerivatives'] = show
-        for nodeDerivativeLabel in self._nodeDerivativeLabels:
-            self._setAllGraphicsVisibility('displayNodeDerivatives' + nodeDerivativeLabel, show and self.isDisplayNodeDerivativeLabels(nodeDerivativeLabel))
+        # single pass over scene graphics for all derivative labels, named 'displayNodeDerivatives' + label
+        prefix = 'displayNodeDerivatives'
+        prefixLength = len(prefix)
+        scene = self._region.getScene()
+        with ChangeManager(scene):
+            graphics = scene.getFirstGraphics()
+            while graphics.isValid():
+                name = graphics.getName()
+                if name and name.startswith(prefix):
+                    graphics.setVisibilityFlag(show and self.isDisplayNodeDerivativeLabels(name[prefixLength:]))
+                graphics = scene.getNextGraphics(graphics)
 
     def isDisplayNodeDerivativeLabels(self, nodeDerivativeLabel):
         '''
         :param nodeDerivativeLabel: Label from self._nodeDerivativeLabels ('D1', 'D2' ...)
         '''
-        return nodeDerivativeLabel in self._settings['displayNodeDerivativeLabels']
+        return nodeDerivativeLabel in self._displayNodeDerivativeLabelsSet
 
     def setDisplayNodeDerivativeLabels(self, nodeDerivativeLabel, show):
         '''
         :param nodeDerivativeLabel: Label from self._nodeDerivativeLabels ('D1', 'D2' ...)
         '''
-        shown = nodeDerivativeLabel in self._settings['displayNodeDerivativeLabels']
+        shown = self.isDisplayNodeDerivativeLabels(nodeDerivativeLabel)
         if show:
             if not shown:
                 # keep in same order as self._nodeDerivativeLabels
@@ -586,6 +735,7 @@ class MeshGeneratorModel(object):
         else:
             if shown:
                 self._settings['displayNodeDerivativeLabels'].remove(nodeDerivativeLabel)
+        self._displayNodeDerivativeLabelsSet = frozenset(self._settings['displayNodeDerivativeLabels'])
         self._setAllGraphicsVisibility('displayNodeDerivatives' + nodeDerivativeLabel, show and self.isDisplayNodeDerivatives())
 
     def isDisplayNodeNumbers(self):
@@ -611,30 +761,25 @@ class MeshGeneratorModel(object):
 
     def setDisplaySurfacesExterior(self, isExterior):
         self._settings['displaySurfacesExterior'] = isExterior
-        surfaces = self._region.getScene().findGraphicsByName('displaySurfaces')
-        surfaces.setExterior(self.isDisplaySurfacesExterior() if (self.getMeshDimension() == 3) else False)
+        self._graphics['displaySurfaces'].setExterior(self.isDisplaySurfacesExterior() if (self.getMeshDimension() == 3) else False)
 
     def isDisplaySurfacesTranslucent(self):
         return self._settings['displaySurfacesTranslucent']
 
     def setDisplaySurfacesTranslucent(self, isTranslucent):
         self._settings['displaySurfacesTranslucent'] = isTranslucent
-        surfaces = self._region.getScene().findGraphicsByName('displaySurfaces')
-        surfacesMaterial = self._materialmodule.findMaterialByName('trans_blue' if isTranslucent else 'solid_blue')
-        surfaces.setMaterial(surfacesMaterial)
-        lines = self._region.getScene().findGraphicsByName('displayLines')
+        self._graphics['displaySurfaces'].setMaterial(self._materials['trans_blue' if isTranslucent else 'solid_blue'])
+        lines = self._graphics['displayLines']
         lineattr = lines.getGraphicslineattributes()
         isTranslucentLines = isTranslucent and (lineattr.getShapeType() == lineattr.SHAPE_TYPE_CIRCLE_EXTRUSION)
-        linesMaterial = self._materialmodule.findMaterialByName('trans_blue' if isTranslucentLines else 'default')
-        lines.setMaterial(linesMaterial)
+        lines.setMaterial(self._materials['trans_blue' if isTranslucentLines else 'default'])
 
     def isDisplaySurfacesWireframe(self):
         return self._settings['displaySurfacesWireframe']
 
     def setDisplaySurfacesWireframe(self, isWireframe):
         self._settings['displaySurfacesWireframe'] = isWireframe
-        surfaces = self._region.getScene().findGraphicsByName('displaySurfaces')
-        surfaces.setRenderPolygonMode(Graphics.RENDER_POLYGON_MODE_WIREFRAME if isWireframe else Graphics.RENDER_POLYGON_MODE_SHADED)
+        self._graphics['displaySurfaces'].setRenderPolygonMode(Graphics.RENDER_POLYGON_MODE_WIREFRAME if isWireframe else Graphics.RENDER_POLYGON_MODE_SHADED)
 
     def isDisplayElementAxes(self):
         return self._getVisibility('displayElementAxes')
@@ -648,33 +793,32 @@ class MeshGeneratorModel(object):
         """
         if self._region is None:
             return False
-        mesh2d = self._region.getFieldmodule().findMeshByDimension(2)
-        if mesh2d.getSize() == 0:
+        if self._mesh2dSize == 0:
             return False
         return self.isDisplayLines() and self.isDisplaySurfaces() and not self.isDisplaySurfacesTranslucent()
 
     def _getMesh(self):
-        fm = self._region.getFieldmodule()
-        for dimension in range(3,0,-1):
-            mesh = fm.findMeshByDimension(dimension)
-            if mesh.getSize() > 0:
-                break
-        if mesh.getSize() == 0:
-            mesh = fm.findMeshByDimension(3)
-        return mesh
+        '''
+        :return: Highest dimension non-empty mesh, or 3D mesh if none. Cached until mesh is regenerated.
+        '''
+        if self._mesh is None:
+            fm = self._fieldmodule
+            for dimension in range(3,0,-1):
+                mesh = fm.findMeshByDimension(dimension)
+                if mesh.getSize() > 0:
+                    break
+            if mesh.getSize() == 0:
+                mesh = fm.findMeshByDimension(3)
+            self._mesh = mesh
+        return self._mesh
 
     def getMeshDimension(self):
         return self._getMesh().getDimension()
 
     def getNodeLocation(self, node_id):
-        fm = self._region.getFieldmodule()
-        with ChangeManager(fm):
-            coordinates = fm.findFieldByName('coordinates')
-            nodes = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
-            node = nodes.findNodeByIdentifier(node_id)
-            fc = fm.createFieldcache()
-            fc.setNode(node)
-            _, position = coordinates.evaluateReal(fc, 3)
+        node = self._nodes.findNodeByIdentifier(node_id)
+        self._fieldcache.setNode(node)
+        _, position = self._coordinates.evaluateReal(self._fieldcache, 3)
         return self._getSceneTransformationFromAdjustedPosition(position)
 
     def getSettings(self):
@@ -694,6 +838,7 @@ class MeshGeneratorModel(object):
             scaffoldPackage = ScaffoldPackage(scaffoldType, { 'scaffoldSettings' : scaffoldSettings })
             settings['scaffoldPackage'] = scaffoldPackage
         self._settings.update(settings)
+        self._displayNodeDerivativeLabelsSet = frozenset(self._settings['displayNodeDerivativeLabels'])
         self._parseDeleteElementsRangesText(self._settings['deleteElementRanges'])
         # migrate old scale text, now held in scaffoldPackage
         oldScaleText = self._settings.get('scale')
@@ -714,50 +859,53 @@ class MeshGeneratorModel(object):
         '''
         if (len(self._deleteElementRanges) == 0) or (len(self._scaffoldPackages) > 1):
             return
-        fm = self._region.getFieldmodule()
         mesh = self._getMesh()
-        meshDimension = mesh.getDimension()
-        nodes = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        # elements are iterated in identifier order, so the first has the lowest identifier
+        firstElement = mesh.createElementiterator().next()
+        if (not firstElement.isValid()) or (self._deleteElementRanges[-1][1] < firstElement.getIdentifier()):
+            return  # no elements in ranges
+        del firstElement
+        fm = self._fieldmodule
+        nodes = self._nodes
         with ChangeManager(fm):
             # put the elements in a group and use subelement handling to get nodes in use by it
             destroyGroup = fm.createFieldGroup()
             destroyGroup.setSubelementHandlingMode(FieldGroup.SUBELEMENT_HANDLING_MODE_FULL)
             destroyElementGroup = destroyGroup.createFieldElementGroup(mesh)
             destroyMesh = destroyElementGroup.getMeshGroup()
-            elementIter = mesh.createElementiterator()
-            element = elementIter.next()
-            while element.isValid():
-                identifier = element.getIdentifier()
-                for deleteElementRange in self._deleteElementRanges:
-                    if (identifier >= deleteElementRange[0]) and (identifier <= deleteElementRange[1]):
-                        destroyMesh.addElement(element)
-                element = elementIter.next()
-            del elementIter
+            # select elements with identifier in any range in a single conditional add
+            cmiss_number = fm.findFieldByName('cmiss_number')
+            inRangeFields = []
+            for deleteElementRange in self._deleteElementRanges:
+                if deleteElementRange[0] == deleteElementRange[1]:
+                    inRangeFields.append(fm.createFieldEqualTo(cmiss_number, fm.createFieldConstant(deleteElementRange[0])))
+                else:
+                    inRangeFields.append(fm.createFieldAnd(
+                        fm.createFieldGreaterThan(cmiss_number, fm.createFieldConstant(deleteElementRange[0] - 0.5)),
+                        fm.createFieldLessThan(cmiss_number, fm.createFieldConstant(deleteElementRange[1] + 0.5))))
+            # combine pairwise so depth of field expression only grows with log of number of ranges
+            while len(inRangeFields) > 1:
+                inRangeFields = [ (fm.createFieldOr(inRangeFields[i], inRangeFields[i + 1]) if ((i + 1) < len(inRangeFields)) else inRangeFields[i])
+                    for i in range(0, len(inRangeFields), 2) ]
+            destroyMesh.addElementsConditional(inRangeFields[0])
+            del inRangeFields
             #print("Deleting", destroyMesh.getSize(), "element(s)")
             if destroyMesh.getSize() > 0:
                 destroyNodeGroup = destroyGroup.getFieldNodeGroup(nodes)
                 destroyNodes = destroyNodeGroup.getNodesetGroup()
                 markerGroup = fm.findFieldByName("marker").castGroup()
                 if markerGroup.isValid():
-                    markerNodes = markerGroup.getFieldNodeGroup(nodes).getNodesetGroup()
                     markerLocation = fm.findFieldByName("marker_location")
-                    #markerName = fm.findFieldByName("marker_name")
-                    if markerNodes.isValid() and markerLocation.isValid():
-                        fieldcache = fm.createFieldcache()
-                        nodeIter = markerNodes.createNodeiterator()
-                        node = nodeIter.next()
-                        while node.isValid():
-                            fieldcache.setNode(node)
-                            element, xi = markerLocation.evaluateMeshLocation(fieldcache, meshDimension)
-                            if element.isValid() and destroyMesh.containsElement(element):
-                                #print("Destroy marker '" + markerName.evaluateString(fieldcache) + "' node", node.getIdentifier(), "in destroyed element", element.getIdentifier(), "at", xi)
-                                destroyNodes.addNode(node)  # so destroyed with others below; can't do here as
-                            node = nodeIter.next()
-                        del nodeIter
-                        del fieldcache
+                    if markerLocation.isValid():
+                        # add marker nodes embedded in destroyed elements so destroyed with others below:
+                        # element group evaluated at marker location is true if host element is in it
+                        markerInDestroyMesh = fm.createFieldAnd(markerGroup, fm.createFieldEmbedded(destroyElementGroup, markerLocation))
+                        destroyNodes.addNodesConditional(markerInDestroyMesh)
+                        del markerInDestroyMesh
                 # must destroy elements first as Zinc won't destroy nodes that are in use
                 mesh.destroyElementsConditional(destroyElementGroup)
                 nodes.destroyNodesConditional(destroyNodeGroup)
+                self._mesh = None  # highest dimension mesh may now be empty
                 # clean up group so no external code hears is notified of its existence
                 del destroyNodes
                 del destroyNodeGroup
@@ -771,10 +919,14 @@ class MeshGeneratorModel(object):
             self._parent_region.removeChild(self._region)
         self._region = self._parent_region.createChild(self._region_name)
         self._scene = self._region.getScene()
-        fm = self._region.getFieldmodule()
+        self._fieldmodule = fm = self._region.getFieldmodule()
+        self._nodes = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        self._fieldcache = fm.createFieldcache()
+        self._mesh = None
         with ChangeManager(fm):
             # logger = self._context.getLogger()
             annotationGroups = scaffoldPackage.generate(self._region, applyTransformation=False)
+            self._coordinates = fm.findFieldByName('coordinates').castFiniteElement()
             # loggerMessageCount = logger.getNumberOfMessages()
             # if loggerMessageCount > 0:
             #     for i in range(1, loggerMessageCount + 1):
@@ -782,6 +934,7 @@ class MeshGeneratorModel(object):
             #     logger.removeAllMessages()
             self._deleteElementsInRanges()
             fm.defineAllFaces()
+            self._mesh2dSize = fm.findMeshByDimension(2).getSize()
             if annotationGroups is not None:
                 for annotationGroup in annotationGroups:
                     annotationGroup.addSubelements()
@@ -794,83 +947,60 @@ class MeshGeneratorModel(object):
         '''
         Establish 4x4 graphics transformation for current scaffold package.
         '''
-        transformationMatrix = None
-        for scaffoldPackage in reversed(self._scaffoldPackages):
-            mat = scaffoldPackage.getTransformationMatrix()
-            if mat:
-                transformationMatrix = matrix_mult(mat, transformationMatrix) if transformationMatrix else mat
+        # matrices from root ScaffoldPackage down, so nested transformations are applied first
+        matrices = [ mat for mat in (scaffoldPackage.getTransformationMatrix() for scaffoldPackage in self._scaffoldPackages) if mat ]
         scene = self._region.getScene()
-        if transformationMatrix:
+        if matrices:
+            transformationMatrix = reduce(matrix_mult, matrices)
             # flatten to list of 16 components for passing to Zinc
-            scene.setTransformationMatrix(transformationMatrix[0] + transformationMatrix[1] + transformationMatrix[2] + transformationMatrix[3])
+            scene.setTransformationMatrix([ value for row in transformationMatrix for value in row ])
         else:
             scene.clearTransformation()
 
-    def _createGraphics(self):
-        fm = self._region.getFieldmodule()
+    def _calculateMeshGraphicsData(self):
+        '''
+        Determine node derivative fields for all versions in use, and axes and glyph sizes
+        for the current mesh. Fairly expensive so only called after the mesh is regenerated.
+        Glyph width is kept in self._glyphWidth for later model radius changes.
+        :return: List of node value fields for all versions of each derivative, axes scale.
+        '''
+        fm = self._fieldmodule
         with ChangeManager(fm):
-            meshDimension = self.getMeshDimension()
-            coordinates = fm.findFieldByName('coordinates').castFiniteElement()
+            coordinates = self._coordinates
             componentsCount = coordinates.getNumberOfComponents()
-            nodes = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
-            fieldcache = fm.createFieldcache()
+            nodes = self._nodes
+            fieldcache = self._fieldcache
 
-            # determine field derivatives for all versions in use: fairly expensive
             # fields in same order as self._nodeDerivativeLabels
             nodeDerivatives = [ Node.VALUE_LABEL_D_DS1, Node.VALUE_LABEL_D_DS2, Node.VALUE_LABEL_D_DS3,
                 Node.VALUE_LABEL_D2_DS1DS2, Node.VALUE_LABEL_D2_DS1DS3, Node.VALUE_LABEL_D2_DS2DS3, Node.VALUE_LABEL_D3_DS1DS2DS3 ]
-            nodeDerivativeFields = [ [ fm.createFieldNodeValue(coordinates, nodeDerivative, 1) ] for nodeDerivative in nodeDerivatives ]
-            derivativesCount = len(nodeDerivatives)
-            maxVersions = [ 1 for nodeDerivative in nodeDerivatives ]
-            lastVersion = 1
-            version = 2
-            while True:
-                nodeIter = nodes.createNodeiterator()
-                node = nodeIter.next()
-                foundCount = sum((1 if (v < lastVersion) else 0) for v in maxVersions)
-                while (node.isValid()) and (foundCount < derivativesCount):
-                    fieldcache.setNode(node)
-                    for d in range(derivativesCount):
-                        if maxVersions[d] == lastVersion:  # only look one higher than last version found
-                            result, values = coordinates.getNodeParameters(fieldcache, -1, nodeDerivatives[d], version, componentsCount)
-                            if (result == RESULT_OK) or (result == RESULT_WARNING_PART_DONE):
-                                maxVersions[d] = version
-                                nodeDerivativeFields[d].append(fm.createFieldNodeValue(coordinates, nodeDerivatives[d], version))
-                                foundCount += 1
-                    node = nodeIter.next()
-                if foundCount >= derivativesCount:
-                    break
-                lastVersion = version
-                version += 1
-            elementDerivativeFields = []
-            for d in range(meshDimension):
-                elementDerivativeFields.append(fm.createFieldDerivative(coordinates, d + 1))
-            elementDerivativesField = fm.createFieldConcatenate(elementDerivativeFields)
-            cmiss_number = fm.findFieldByName('cmiss_number')
-            markerGroup = fm.findFieldByName('marker').castGroup()
-            markerName = findOrCreateFieldStoredString(fm, 'marker_name')
-            radius = fm.findFieldByName('radius')
-            markerLocation = findOrCreateFieldStoredMeshLocation(fm, self._getMesh(), name='marker_location')
-            markerHostCoordinates = fm.createFieldEmbedded(coordinates, markerLocation)
+            # version 1 is always used; count nodes with each higher version until none found
+            nodeDerivativeFields = []
+            for nodeDerivative in nodeDerivatives:
+                versionFields = [ fm.createFieldNodeValue(coordinates, nodeDerivative, 1) ]
+                version = 2
+                while True:
+                    versionField = fm.createFieldNodeValue(coordinates, nodeDerivative, version)
+                    versionNodesCount = fm.createFieldNodesetSum(fm.createFieldIsDefined(versionField), nodes)
+                    result, count = versionNodesCount.evaluateReal(fieldcache, 1)
+                    del versionNodesCount
+                    if (result != RESULT_OK) or (count == 0.0):
+                        break
+                    versionFields.append(versionField)
+                    version += 1
+                del versionField
+                nodeDerivativeFields.append(versionFields)
 
             # get sizing for axes
-            axesScale = 1.0
             minX, maxX = evaluateFieldNodesetRange(coordinates, nodes)
             if componentsCount == 1:
                 maxRange = maxX - minX
             else:
-                maxRange = maxX[0] - minX[0]
-                for c in range(1, componentsCount):
-                    maxRange = max(maxRange, maxX[c] - minX[c])
-            if maxRange > 0.0:
-                while axesScale*10.0 < maxRange:
-                    axesScale *= 10.0
-                while axesScale*0.1 > maxRange:
-                    axesScale *= 0.1
+                maxRange = max((maxX[c] - minX[c]) for c in range(componentsCount))
+            axesScale = getAxesScale(maxRange)
 
             # fixed width glyph size is based on average element size in all dimensions
             mesh1d = fm.findMeshByDimension(1)
-            meanLineLength = 0.0
             lineCount = mesh1d.getSize()
             if lineCount > 0:
                 one = fm.createFieldConstant(1.0)
@@ -881,19 +1011,26 @@ class MeshGeneratorModel(object):
                 del one
             if (lineCount == 0) or (glyphWidth == 0.0):
                 # use function of coordinate range if no elements
-                if componentsCount == 1:
-                    maxScale = maxX - minX
-                else:
-                    first = True
-                    for c in range(componentsCount):
-                        scale = maxX[c] - minX[c]
-                        if first or (scale > maxScale):
-                            maxScale = scale
-                            first = False
-                if maxScale == 0.0:
-                    maxScale = 1.0
-                glyphWidth = 0.01*maxScale
-            del fieldcache
+                glyphWidth = 0.01*(maxRange if (maxRange != 0.0) else 1.0)
+            self._glyphWidth = glyphWidth
+        return nodeDerivativeFields, axesScale
+
+    def _createGraphics(self):
+        nodeDerivativeFields, axesScale = self._calculateMeshGraphicsData()
+        glyphWidth = self._glyphWidth
+        fm = self._fieldmodule
+        with ChangeManager(fm):
+            meshDimension = self.getMeshDimension()
+            coordinates = self._coordinates
+            elementDerivativeFields = []
+            for d in range(meshDimension):
+                elementDerivativeFields.append(fm.createFieldDerivative(coordinates, d + 1))
+            elementDerivativesField = fm.createFieldConcatenate(elementDerivativeFields)
+            cmiss_number = fm.findFieldByName('cmiss_number')
+            markerGroup = fm.findFieldByName('marker').castGroup()
+            markerName = findOrCreateFieldStoredString(fm, 'marker_name')
+            markerLocation = findOrCreateFieldStoredMeshLocation(fm, self._getMesh(), name='marker_location')
+            markerHostCoordinates = fm.createFieldEmbedded(coordinates, markerLocation)
 
         # make graphics
         scene = self._region.getScene()
@@ -907,22 +1044,13 @@ class MeshGeneratorModel(object):
             pointattr.setGlyphShapeType(Glyph.SHAPE_TYPE_AXES_XYZ)
             pointattr.setBaseSize([ axesScale ])
             pointattr.setLabelText(1, '  ' + str(axesScale))
-            axes.setMaterial(self._materialmodule.findMaterialByName('grey50'))
+            axes.setMaterial(self._materials['grey50'])
             axes.setName('displayAxes')
             axes.setVisibilityFlag(self.isDisplayAxes())
 
             lines = scene.createGraphicsLines()
             lines.setCoordinateField(coordinates)
             lines.setExterior(self.isDisplayLinesExterior())
-            lineattr = lines.getGraphicslineattributes()
-            if self.isDisplayModelRadius() and radius.isValid():
-                lineattr.setShapeType(lineattr.SHAPE_TYPE_CIRCLE_EXTRUSION)
-                lineattr.setBaseSize([ 0.0 ])
-                lineattr.setScaleFactors([ 2.0 ])
-                lineattr.setOrientationScaleField(radius)
-            isTranslucentLines = self.isDisplaySurfacesTranslucent() and (lineattr.getShapeType() == lineattr.SHAPE_TYPE_CIRCLE_EXTRUSION)
-            linesMaterial = self._materialmodule.findMaterialByName('trans_blue' if isTranslucentLines else 'default')
-            lines.setMaterial(linesMaterial)
             lines.setName('displayLines')
             lines.setVisibilityFlag(self.isDisplayLines())
 
@@ -931,15 +1059,10 @@ class MeshGeneratorModel(object):
             nodePoints.setCoordinateField(coordinates)
             pointattr = nodePoints.getGraphicspointattributes()
             pointattr.setGlyphShapeType(Glyph.SHAPE_TYPE_SPHERE)
-            if self.isDisplayModelRadius() and radius.isValid():
-                pointattr.setBaseSize([ 0.0 ])
-                pointattr.setScaleFactors([ 2.0 ])
-                pointattr.setOrientationScaleField(radius)
-            else:
-                pointattr.setBaseSize([ glyphWidth ])
-            nodePoints.setMaterial(self._materialmodule.findMaterialByName('white'))
+            nodePoints.setMaterial(self._materials['white'])
             nodePoints.setName('displayNodePoints')
             nodePoints.setVisibilityFlag(self.isDisplayNodePoints())
+            self._setModelRadiusGraphics(lines, nodePoints)
 
             nodeNumbers = scene.createGraphicsPoints()
             nodeNumbers.setFieldDomainType(Field.DOMAIN_TYPE_NODES)
@@ -947,33 +1070,39 @@ class MeshGeneratorModel(object):
             pointattr = nodeNumbers.getGraphicspointattributes()
             pointattr.setLabelField(cmiss_number)
             pointattr.setGlyphShapeType(Glyph.SHAPE_TYPE_NONE)
-            nodeNumbers.setMaterial(self._materialmodule.findMaterialByName('green'))
+            nodeNumbers.setMaterial(self._materials['green'])
             nodeNumbers.setName('displayNodeNumbers')
             nodeNumbers.setVisibilityFlag(self.isDisplayNodeNumbers())
 
             # names in same order as self._nodeDerivativeLabels 'D1', 'D2', 'D3', 'D12', 'D13', 'D23', 'D123' and nodeDerivativeFields
             nodeDerivativeMaterialNames = [ 'gold', 'silver', 'green', 'cyan', 'magenta', 'yellow', 'blue' ]
             derivativeScales = [ 1.0, 1.0, 1.0, 0.5, 0.5, 0.5, 0.25 ]
-            for i in range(len(self._nodeDerivativeLabels)):
-                nodeDerivativeLabel = self._nodeDerivativeLabels[i]
-                maxVersions = len(nodeDerivativeFields[i])
-                for v in range(maxVersions):
+            derivativeBaseSize = [ 0.0, glyphWidth, glyphWidth ]
+            displayNodeDerivatives = self.isDisplayNodeDerivatives()
+            for nodeDerivativeLabel, materialName, derivativeScale, versionFields in zip(self._nodeDerivativeLabels,
+                    nodeDerivativeMaterialNames, derivativeScales, nodeDerivativeFields):
+                # settings common to all versions of derivative
+                material = self._materials[materialName]
+                name = 'displayNodeDerivatives' + nodeDerivativeLabel
+                scaleFactors = [ derivativeScale, 0.0, 0.0 ]
+                visibility = displayNodeDerivatives and self.isDisplayNodeDerivativeLabels(nodeDerivativeLabel)
+                maxVersions = len(versionFields)
+                for v, versionField in enumerate(versionFields):
                     nodeDerivatives = scene.createGraphicsPoints()
                     nodeDerivatives.setFieldDomainType(Field.DOMAIN_TYPE_NODES)
                     nodeDerivatives.setCoordinateField(coordinates)
                     pointattr = nodeDerivatives.getGraphicspointattributes()
                     pointattr.setGlyphShapeType(Glyph.SHAPE_TYPE_ARROW_SOLID)
-                    pointattr.setOrientationScaleField(nodeDerivativeFields[i][v])
-                    pointattr.setBaseSize([0.0, glyphWidth, glyphWidth])
-                    pointattr.setScaleFactors([ derivativeScales[i], 0.0, 0.0 ])
+                    pointattr.setOrientationScaleField(versionField)
+                    pointattr.setBaseSize(derivativeBaseSize)
+                    pointattr.setScaleFactors(scaleFactors)
                     if maxVersions > 1:
                         pointattr.setLabelOffset([ 1.05, 0.0, 0.0 ])
                         pointattr.setLabelText(1, str(v + 1))
-                    material = self._materialmodule.findMaterialByName(nodeDerivativeMaterialNames[i])
                     nodeDerivatives.setMaterial(material)
                     nodeDerivatives.setSelectedMaterial(material)
-                    nodeDerivatives.setName('displayNodeDerivatives' + nodeDerivativeLabel)
-                    nodeDerivatives.setVisibilityFlag(self.isDisplayNodeDerivatives() and self.isDisplayNodeDerivativeLabels(nodeDerivativeLabel))
+                    nodeDerivatives.setName(name)
+                    nodeDerivatives.setVisibilityFlag(visibility)
 
             elementNumbers = scene.createGraphicsPoints()
             elementNumbers.setFieldDomainType(Field.DOMAIN_TYPE_MESH_HIGHEST_DIMENSION)
@@ -981,15 +1110,14 @@ class MeshGeneratorModel(object):
             pointattr = elementNumbers.getGraphicspointattributes()
             pointattr.setLabelField(cmiss_number)
             pointattr.setGlyphShapeType(Glyph.SHAPE_TYPE_NONE)
-            elementNumbers.setMaterial(self._materialmodule.findMaterialByName('cyan'))
+            elementNumbers.setMaterial(self._materials['cyan'])
             elementNumbers.setName('displayElementNumbers')
             elementNumbers.setVisibilityFlag(self.isDisplayElementNumbers())
             surfaces = scene.createGraphicsSurfaces()
             surfaces.setCoordinateField(coordinates)
             surfaces.setRenderPolygonMode(Graphics.RENDER_POLYGON_MODE_WIREFRAME if self.isDisplaySurfacesWireframe() else Graphics.RENDER_POLYGON_MODE_SHADED)
             surfaces.setExterior(self.isDisplaySurfacesExterior() if (meshDimension == 3) else False)
-            surfacesMaterial = self._materialmodule.findMaterialByName('trans_blue' if self.isDisplaySurfacesTranslucent() else 'solid_blue')
-            surfaces.setMaterial(surfacesMaterial)
+            surfaces.setMaterial(self._materials['trans_blue' if self.isDisplaySurfacesTranslucent() else 'solid_blue'])
             surfaces.setName('displaySurfaces')
             surfaces.setVisibilityFlag(self.isDisplaySurfaces())
 
@@ -1008,7 +1136,7 @@ class MeshGeneratorModel(object):
             else:
                 pointattr.setBaseSize([0.0, 0.0, 0.0])
                 pointattr.setScaleFactors([0.25, 0.25, 0.25])
-            elementAxes.setMaterial(self._materialmodule.findMaterialByName('yellow'))
+            elementAxes.setMaterial(self._materials['yellow'])
             elementAxes.setName('displayElementAxes')
             elementAxes.setVisibilityFlag(self.isDisplayElementAxes())
 
@@ -1022,10 +1150,12 @@ class MeshGeneratorModel(object):
             pointattr.setLabelField(markerName)
             pointattr.setGlyphShapeType(Glyph.SHAPE_TYPE_CROSS)
             pointattr.setBaseSize(2*glyphWidth)
-            markerPoints.setMaterial(self._materialmodule.findMaterialByName('yellow'))
+            markerPoints.setMaterial(self._materials['yellow'])
             markerPoints.setName('displayMarkerPoints')
             markerPoints.setVisibilityFlag(self.isDisplayMarkerPoints())
 
+            self._graphics = { graphics.getName() : graphics for graphics in
+                ( axes, lines, nodePoints, nodeNumbers, elementNumbers, surfaces, elementAxes, markerPoints ) }
 
     def updateSettingsBeforeWrite(self):
         self._updateMeshEdits()
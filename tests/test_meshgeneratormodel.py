@@ -0,0 +1,286 @@
+"""
+Tests of MeshGeneratorModel utilities, and of deleting element ranges from a generated scaffold.
+"""
+
+import math
+import unittest
+
+from opencmiss.utils.maths.vectorops import axis_angle_to_rotation_matrix, euler_to_rotation_matrix, matrix_mult, rotation_matrix_to_euler
+from opencmiss.utils.zinc.field import findOrCreateFieldStoredMeshLocation
+from opencmiss.utils.zinc.general import ChangeManager
+from opencmiss.zinc.context import Context
+from opencmiss.zinc.field import Field
+
+from mapclientplugins.meshgeneratorstep.model.meshgeneratormodel import MeshGeneratorModel, axisAngleToQuaternion, \
+    eulerToQuaternion, getAxesScale, identifierRangesToText, identifiersToRanges, parseIdentifierRanges, quaternionMultiply, \
+    quaternionToEuler, zincIterate
+
+
+def matrixInteractionRotate(rotation, axis, angle):
+    """
+    Previous interactionRotate calculation using rotation matrices.
+    :return: New euler angles in degrees.
+    """
+    mat1 = axis_angle_to_rotation_matrix(axis, angle)
+    mat2 = euler_to_rotation_matrix([ deg*math.pi/180.0 for deg in rotation ])
+    newmat = matrix_mult(mat1, mat2)
+    return [ rad*180.0/math.pi for rad in rotation_matrix_to_euler(newmat) ]
+
+
+def quaternionInteractionRotate(rotation, axis, angle):
+    """
+    MeshGeneratorModel.interactionRotate calculation using quaternion helpers.
+    :return: New euler angles in degrees.
+    """
+    quat1 = axisAngleToQuaternion(axis, angle)
+    quat2 = eulerToQuaternion(list(map(math.radians, rotation)))
+    return list(map(math.degrees, quaternionToEuler(quaternionMultiply(quat1, quat2))))
+
+
+class RotationTestCase(unittest.TestCase):
+
+    EULERS = [
+        [ 0.0, 0.0, 0.0 ],
+        [ 0.3, -0.2, 0.1 ],
+        [ -2.5, 1.2, 3.0 ],
+        [ 1.0, -1.5, -2.0 ],
+        [ math.pi, 0.4, -math.pi/2.0 ] ]
+
+    def assertMatricesAlmostEqual(self, matrix1, matrix2, delta=1.0E-8):
+        for row1, row2 in zip(matrix1, matrix2):
+            for value1, value2 in zip(row1, row2):
+                self.assertAlmostEqual(value1, value2, delta=delta)
+
+    def test_euler_quaternion_round_trip(self):
+        for euler in self.EULERS:
+            q = eulerToQuaternion(euler)
+            self.assertAlmostEqual(sum(c*c for c in q), 1.0, delta=1.0E-12)
+            result = quaternionToEuler(q)
+            for angle1, angle2 in zip(euler, result):
+                # azimuth and roll of pi may come back as -pi
+                self.assertAlmostEqual(math.cos(angle1), math.cos(angle2), delta=1.0E-12)
+                self.assertAlmostEqual(math.sin(angle1), math.sin(angle2), delta=1.0E-12)
+
+    def test_euler_quaternion_matches_rotation_matrix(self):
+        for euler in self.EULERS:
+            w, x, y, z = eulerToQuaternion(euler)
+            matrix = [
+                [ 1.0 - 2.0*(y*y + z*z), 2.0*(x*y - w*z), 2.0*(x*z + w*y) ],
+                [ 2.0*(x*y + w*z), 1.0 - 2.0*(x*x + z*z), 2.0*(y*z - w*x) ],
+                [ 2.0*(x*z - w*y), 2.0*(y*z + w*x), 1.0 - 2.0*(x*x + y*y) ] ]
+            self.assertMatricesAlmostEqual(matrix, euler_to_rotation_matrix(euler), delta=1.0E-12)
+
+    def test_quaternion_multiply(self):
+        axis = [ 0.2, -0.5, 0.7 ]
+        q1 = axisAngleToQuaternion(axis, 0.8)
+        q2 = eulerToQuaternion([ 0.3, -0.2, 0.1 ])
+        expectedMatrix = matrix_mult(axis_angle_to_rotation_matrix(axis, 0.8), euler_to_rotation_matrix([ 0.3, -0.2, 0.1 ]))
+        self.assertMatricesAlmostEqual(euler_to_rotation_matrix(quaternionToEuler(quaternionMultiply(q1, q2))), expectedMatrix)
+        # identity
+        result = quaternionMultiply([ 1.0, 0.0, 0.0, 0.0 ], q2)
+        for value1, value2 in zip(result, q2):
+            self.assertAlmostEqual(value1, value2, delta=1.0E-15)
+
+    def test_gimbal_lock(self):
+        for elevation in (0.5*math.pi, -0.5*math.pi):
+            for euler in ([ 0.7, elevation, 0.0 ], [ 0.0, elevation, 0.7 ], [ -1.2, elevation, 2.1 ]):
+                result = quaternionToEuler(eulerToQuaternion(euler))
+                self.assertAlmostEqual(result[1], elevation, delta=1.0E-6)
+                self.assertEqual(result[2], 0.0)
+                self.assertMatricesAlmostEqual(euler_to_rotation_matrix(result), euler_to_rotation_matrix(euler), delta=1.0E-7)
+
+    def test_interaction_rotate_matches_matrix(self):
+        rotations = [ [ 0.0, 0.0, 0.0 ], [ 30.0, -20.0, 10.0 ], [ -150.0, 70.0, 120.0 ] ]
+        axes = [ [ 1.0, 0.0, 0.0 ], [ 0.0, 0.0, 2.0 ], [ 0.3, -0.4, 0.5 ] ]
+        for rotation in rotations:
+            for axis in axes:
+                for angle in (0.05, -0.2, 1.0):
+                    expected = matrixInteractionRotate(rotation, axis, angle)
+                    result = quaternionInteractionRotate(rotation, axis, angle)
+                    for angle1, angle2 in zip(expected, result):
+                        self.assertAlmostEqual(angle1, angle2, delta=1.0E-8)
+
+    def test_interaction_rotate_to_gimbal_lock(self):
+        # rotate about azimuth-rotated y axis to elevation +/-90 degrees. Compare with the
+        # product of rotation matrices as the previous Euler angle decomposition was
+        # inaccurate at gimbal lock
+        axis = [ -math.sin(math.pi/9.0), math.cos(math.pi/9.0), 0.0 ]
+        for rotation, angle in (([ 20.0, 60.0, 0.0 ], math.pi/6.0), ([ 20.0, -60.0, 15.0 ], -math.pi/6.0)):
+            expectedMatrix = matrix_mult(axis_angle_to_rotation_matrix(axis, angle),
+                euler_to_rotation_matrix([ math.radians(deg) for deg in rotation ]))
+            result = quaternionInteractionRotate(rotation, axis, angle)
+            self.assertAlmostEqual(math.fabs(result[1]), 90.0, delta=1.0E-6)
+            self.assertEqual(result[2], 0.0)
+            self.assertMatricesAlmostEqual(euler_to_rotation_matrix([ math.radians(deg) for deg in result ]), expectedMatrix, delta=1.0E-7)
+
+
+class IdentifierRangesTestCase(unittest.TestCase):
+
+    def assertRangesText(self, rangesText, expectedRanges, expectedText):
+        identifierRanges = parseIdentifierRanges(rangesText)
+        self.assertEqual(identifierRanges, expectedRanges)
+        self.assertEqual(identifierRangesToText(identifierRanges), expectedText)
+
+    def test_parse_ranges(self):
+        self.assertRangesText('', [], '')
+        self.assertRangesText('7', [ (7, 7) ], '7')
+        self.assertRangesText('0', [ (0, 0) ], '0')
+        self.assertRangesText('3-5', [ (3, 5) ], '3-5')
+        self.assertRangesText(' 4 - 6 , 9', [ (4, 6), (9, 9) ], '4-6,9')
+        self.assertRangesText('10,1-2,5', [ (1, 2), (5, 5), (10, 10) ], '1-2,5,10')
+
+    def test_parse_reversed_ranges(self):
+        self.assertRangesText('5-3', [ (3, 5) ], '3-5')
+        self.assertRangesText('12-10,20-15', [ (10, 12), (15, 20) ], '10-12,15-20')
+
+    def test_parse_malformed_ranges(self):
+        # expected results are those from the previous character-stripping parser
+        # trailing characters after identifiers are ignored e.g. from select 's' key
+        self.assertRangesText('7s', [ (7, 7) ], '7')
+        self.assertRangesText('3s-5s', [ (3, 5) ], '3-5')
+        # entries without valid identifiers are ignored
+        self.assertRangesText('abc', [], '')
+        self.assertRangesText('s7', [], '')
+        self.assertRangesText('1-3,x,5', [ (1, 3), (5, 5) ], '1-3,5')
+        self.assertRangesText('1-3,,8', [ (1, 3), (8, 8) ], '1-3,8')
+        self.assertRangesText('1--3', [], '')
+        self.assertRangesText('-5,5-', [], '')
+        self.assertRangesText('1 2', [], '')
+        # parts after a second '-' are ignored
+        self.assertRangesText('2-3-9', [ (2, 3) ], '2-3')
+
+    def test_merge_ranges(self):
+        # overlapping
+        self.assertRangesText('1-4,3-8', [ (1, 8) ], '1-8')
+        self.assertRangesText('2-6,4', [ (2, 6) ], '2-6')
+        self.assertRangesText('4,2-6', [ (2, 6) ], '2-6')
+        self.assertRangesText('5-10,1-20', [ (1, 20) ], '1-20')
+        # adjacent
+        self.assertRangesText('1-4,5-8', [ (1, 8) ], '1-8')
+        self.assertRangesText('3,1,2', [ (1, 3) ], '1-3')
+        self.assertRangesText('1-4,6-8', [ (1, 4), (6, 8) ], '1-4,6-8')
+        # duplicates
+        self.assertRangesText('3,3', [ (3, 3) ], '3')
+        self.assertRangesText('2-5,5-2,2-5', [ (2, 5) ], '2-5')
+        # reversed, overlapping and adjacent together
+        self.assertRangesText('12-10,9,13', [ (9, 13) ], '9-13')
+        self.assertRangesText('100-99,98,101-103,97,200,150-160,155', [ (97, 103), (150, 160), (200, 200) ], '97-103,150-160,200')
+
+    def test_identifiers_to_ranges(self):
+        self.assertEqual(identifiersToRanges([]), [])
+        for identifiers, expectedText in (
+                ([ 1 ], '1'),
+                ([ 1, 2, 3 ], '1-3'),
+                ([ 1, 3 ], '1,3'),
+                ([ 1, 2, 4, 5, 6, 9 ], '1-2,4-6,9'),
+                ([ 3, 4, 5, 7, 8, 20 ], '3-5,7-8,20')):
+            self.assertEqual(identifierRangesToText(identifiersToRanges(identifiers)), expectedText)
+
+
+class AxesScaleTestCase(unittest.TestCase):
+
+    def test_axes_scale_powers_of_ten(self):
+        for maxRange, expectedScale in (
+                (0.0, 1.0),
+                (-1.0, 1.0),
+                (1.0, 1.0),
+                (10.0, 1.0),
+                (10.5, 10.0),
+                (100.0, 10.0),
+                (150.0, 100.0),
+                (1000.0, 100.0),
+                (1.0E12, 1.0E11),
+                (0.1, 1.0),
+                (0.099, 0.1),
+                (0.05, 0.1),
+                (0.01, 0.01),
+                (0.0099, 0.01),
+                (0.001, 0.001),
+                (1.0E-12, 1.0E-12)):
+            self.assertEqual(getAxesScale(maxRange), expectedScale)
+        # axes label
+        self.assertEqual(str(getAxesScale(0.01)), '0.01')
+        self.assertEqual(str(getAxesScale(150.0)), '100.0')
+
+    def test_axes_scale_boundaries(self):
+        # just above and below powers of 10
+        for exponent in range(-12, 13):
+            power = 10.0**exponent
+            above = power*(1.0 + 1.0E-15)
+            below = power*(1.0 - 1.0E-15)
+            if exponent >= 1:
+                self.assertEqual(getAxesScale(power), 10.0**(exponent - 1) if (exponent > 1) else 1.0)
+                self.assertEqual(getAxesScale(above), power)
+                self.assertEqual(getAxesScale(below), getAxesScale(power))
+            elif exponent <= -1:
+                self.assertEqual(getAxesScale(power), power if (exponent < -1) else 1.0)
+                self.assertEqual(getAxesScale(below), power)
+                self.assertEqual(getAxesScale(above), 10.0**(exponent + 1))
+
+
+class DeleteElementRangesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._context = Context('test')
+        materialmodule = self._context.getMaterialmodule()
+        materialmodule.defineStandardMaterials()
+        self._context.getGlyphmodule().defineStandardGlyphs()
+        self._model = MeshGeneratorModel(self._context.getDefaultRegion(), materialmodule)
+        self._model.setScaffoldTypeByName('3D Box 1')
+        # 8x1x1 elements with 9x2x2 nodes
+        self._model.setScaffoldOption('Number of elements 1', 8)
+        fm = self._model._region.getFieldmodule()
+        self._mesh = fm.findMeshByDimension(3)
+        self._nodes = fm.findNodesetByFieldDomainType(Field.DOMAIN_TYPE_NODES)
+        self.assertEqual(self._mesh.getSize(), 8)
+        self.assertEqual(self._nodes.getSize(), 36)
+        # marker nodes 101, 102, 103 embedded in elements 2, 5, 7
+        with ChangeManager(fm):
+            markerGroup = fm.createFieldGroup()
+            markerGroup.setName('marker')
+            markerGroup.setManaged(True)
+            markerNodes = markerGroup.createFieldNodeGroup(self._nodes).getNodesetGroup()
+            markerLocation = findOrCreateFieldStoredMeshLocation(fm, self._mesh, name='marker_location')
+            nodetemplate = self._nodes.createNodetemplate()
+            nodetemplate.defineField(markerLocation)
+            fieldcache = fm.createFieldcache()
+            for nodeIdentifier, elementIdentifier in ((101, 2), (102, 5), (103, 7)):
+                node = self._nodes.createNode(nodeIdentifier, nodetemplate)
+                markerNodes.addNode(node)
+                fieldcache.setNode(node)
+                markerLocation.assignMeshLocation(fieldcache, self._mesh.findElementByIdentifier(elementIdentifier), [ 0.5, 0.5, 0.5 ])
+
+    def deleteElementRanges(self, rangesText):
+        """
+        Delete element ranges from the current mesh without regenerating it, which would lose the markers.
+        :return: Surviving element identifiers, surviving node identifiers.
+        """
+        self._model._parseDeleteElementsRangesText(rangesText)
+        self._model._deleteElementsInRanges()
+        return [ element.getIdentifier() for element in zincIterate(self._mesh.createElementiterator()) ], \
+            [ node.getIdentifier() for node in zincIterate(self._nodes.createNodeiterator()) ]
+
+    def test_delete_element_ranges(self):
+        elementIdentifiers, nodeIdentifiers = self.deleteElementRanges('2-3,7')
+        self.assertEqual(elementIdentifiers, [ 1, 4, 5, 6, 8 ])
+        # only the 4 nodes between elements 2 and 3 are not used by other elements
+        self.assertEqual(len(nodeIdentifiers), 32 + 1)
+        # marker nodes in deleted elements are destroyed, others survive
+        self.assertNotIn(101, nodeIdentifiers)
+        self.assertIn(102, nodeIdentifiers)
+        self.assertNotIn(103, nodeIdentifiers)
+
+    def test_delete_all_elements(self):
+        elementIdentifiers, nodeIdentifiers = self.deleteElementRanges('1-4,5-8')
+        self.assertEqual(elementIdentifiers, [])
+        self.assertEqual(nodeIdentifiers, [])
+
+    def test_delete_no_elements(self):
+        for rangesText in ('0', '20-30', ''):
+            elementIdentifiers, nodeIdentifiers = self.deleteElementRanges(rangesText)
+            self.assertEqual(elementIdentifiers, [ 1, 2, 3, 4, 5, 6, 7, 8 ])
+            self.assertEqual(len(nodeIdentifiers), 36 + 3)
+
+
+if __name__ == '__main__':
+    unittest.main()